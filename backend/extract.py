@@ -1,16 +1,58 @@
 import io
+import posixpath
 import re
-from typing import List, Dict, Any, Tuple
+import zipfile
+from bisect import bisect_right
+from typing import BinaryIO, List, Dict, Any, Tuple
 
-import pandas as pd
-from docx import Document
+from docx.enum.text import WD_COLOR_INDEX
 from docx.opc.constants import RELATIONSHIP_TYPE as RT
 from lxml import etree
 from docx.oxml.ns import qn
+from docx.oxml.parser import parse_xml
+from docx.text.paragraph import Paragraph
 
 NS = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
 VALID_PREFIXES = {"CE", "CS", "BE", "IN", "CC", "A"}
 
+# Patterns used on every paragraph/comment, compiled once at import
+_SENT_SPLIT_RE = re.compile(r"(?<=[\.!?])\s+")
+_HEX8_RE = re.compile(r"[0-9a-f]{8}")
+# Only codes with a valid prefix ("CE", "CE_P", ...) match, so no filtering is needed afterwards
+_CODE_RE = re.compile(
+    r"\b(?:" + "|".join(sorted(VALID_PREFIXES, key=lambda p: (-len(p), p))) + r")(?:_[A-Z]{1,4})?\b"
+)
+
+# Clark names for the WordprocessingML tags/attributes read directly via lxml
+_W_COMMENT_RANGE_START = qn("w:commentRangeStart")
+_W_COMMENT_RANGE_END = qn("w:commentRangeEnd")
+_W_T = qn("w:t")
+_W_P = qn("w:p")
+_W_TBL = qn("w:tbl")
+_W_TR = qn("w:tr")
+_W_TC = qn("w:tc")
+_W_R = qn("w:r")
+_W_HYPERLINK = qn("w:hyperlink")
+_W_RPR = qn("w:rPr")
+_W_HIGHLIGHT = qn("w:highlight")
+_W_SHD = qn("w:shd")
+_W_VAL = qn("w:val")
+_W_FILL = qn("w:fill")
+_W_COLOR = qn("w:color")
+_W_THEMEFILL = qn("w:themeFill")
+_W_THEMECOLOR = qn("w:themeColor")
+# Run children other than <w:t> that contribute text (tab, breaks, ...), as in CT_R.text
+_W_RUN_INNER_TEXT = frozenset(qn(t) for t in ("w:br", "w:cr", "w:noBreakHyphen", "w:ptab", "w:tab"))
+_W_COMMENT = qn("w:comment")
+_W_ID = qn("w:id")
+_W_AUTHOR = qn("w:author")
+_W_DATE = qn("w:date")
+
+# XPath expressions compiled once instead of on every .xpath() call
+_XP_HAS_RUN_COLOR = etree.XPath(
+    "boolean((w:r | w:hyperlink/w:r)/w:rPr/*[self::w:highlight or self::w:shd])", namespaces=NS
+)
+
 # Map common shading hex codes to the same identifiers returned by python-docx highlights
 HEX_TO_HIGHLIGHT = {
     "ffff00": "yellow",
@@ -45,206 +87,279 @@ def normalize_highlight_value(val):
     if lowered in HEX_TO_HIGHLIGHT:
         return HEX_TO_HIGHLIGHT[lowered]
     # fallback: keep hex strings normalized without trailing alpha channel
-    if re.fullmatch(r"[0-9a-f]{8}", lowered):
+    if _HEX8_RE.fullmatch(lowered):
         lowered = lowered[:6]
     return lowered
 
 
-def run_highlight_or_shading(run) -> str | None:
-    """Return normalized highlight color, supporting both highlight and shading."""
-    color = normalize_highlight_value(run.font.highlight_color)
-    if color:
-        return color
+# Raw w:highlight/@w:val -> normalized name, the same way python-docx reports it.
+# A fixed table: values come from uploaded files, so nothing is cached per value.
+_HIGHLIGHT_BY_XML: Dict[str, str] = {
+    m.xml_value: normalize_highlight_value(m) for m in WD_COLOR_INDEX if m.xml_value is not None
+}
+
+
+def run_element_highlight_or_shading(r_el) -> str | None:
+    """Return normalized highlight color of a <w:r> element, supporting both highlight and shading."""
+    rPr = r_el.find(_W_RPR)
+    if rPr is None:
+        return None
+    hl = rPr.find(_W_HIGHLIGHT)
+    if hl is not None:
+        val = hl.get(_W_VAL)
+        # unknown values (e.g. w:val="none": no highlight applied) fall through to shading
+        color = _HIGHLIGHT_BY_XML.get(val) if val else None
+        if color:
+            return color
     # Inspect shading (<w:shd>) which some docs use instead of highlight
-    shd_elems = run._element.xpath("w:rPr/w:shd")
-    if not shd_elems:
+    shd = rPr.find(_W_SHD)
+    if shd is None:
         return None
-    shd = shd_elems[0]
-    fill = shd.get(qn("w:fill"))
+    fill = shd.get(_W_FILL)
     if fill and fill.lower() != "auto":
         normalized = normalize_highlight_value(fill)
         if normalized:
             return normalized
-    color_attr = shd.get(qn("w:color"))
+    color_attr = shd.get(_W_COLOR)
     if color_attr and color_attr.lower() not in {"auto", "000000"}:
         normalized = normalize_highlight_value(color_attr)
         if normalized:
             return normalized
-    theme_fill = shd.get(qn("w:themeFill"))
+    theme_fill = shd.get(_W_THEMEFILL)
     if theme_fill:
         return normalize_highlight_value(theme_fill)
-    theme_color = shd.get(qn("w:themeColor"))
+    theme_color = shd.get(_W_THEMECOLOR)
     if theme_color:
         return normalize_highlight_value(theme_color)
     return None
 
 
-def iter_paragraphs_with_index(doc: Document):
-    idx = 0
-    for i, p in enumerate(doc.paragraphs):
-        yield p, i
-    for tbl in doc.tables:
-        for row in tbl.rows:
-            for cell in row.cells:
-                seen = set()
-                for p in cell.paragraphs:
-                    pid = id(p._element)
-                    if pid in seen:
-                        continue
-                    seen.add(pid)
-                    # paragraph indices in tables are appended at the end
-                    yield p, None
-
-
-def sentence_window(text: str, start_index: int) -> str:
-    parts = re.split(r"(?<=[\.!?])\s+", text)
+def run_element_text(r_el) -> str:
+    """Text of a <w:r> element, same as CT_R.text but without an XPath query per run."""
+    parts: List[str] = []
+    for child in r_el:
+        tag = child.tag
+        if tag == _W_T:
+            if child.text:
+                parts.append(child.text)
+        elif tag in _W_RUN_INNER_TEXT:
+            parts.append(str(child))
+    return "".join(parts)
+
+
+def _iter_table_paragraphs(tbl):
+    """Yield the <w:p> of each <w:tc> in document order, recursing into nested tables.
+
+    Walks tr/tc/p explicitly rather than tbl.iter(w:p): that would also descend into runs
+    and pick up textbox paragraphs, which Word stores twice (mc:Choice and mc:Fallback).
+    """
+    for tr in tbl.iterchildren(_W_TR):
+        for tc in tr.iterchildren(_W_TC):
+            for el in tc.iterchildren(_W_P, _W_TBL):
+                if el.tag == _W_P:
+                    yield el
+                else:
+                    yield from _iter_table_paragraphs(el)
+
+
+def iter_paragraphs_with_index(body):
+    for i, p_el in enumerate(body.iterchildren(_W_P)):
+        yield Paragraph(p_el, None), i
+    for tbl in body.iterchildren(_W_TBL):
+        # each <w:tc> is its own element, so merged cells don't repeat their paragraphs
+        for p_el in _iter_table_paragraphs(tbl):
+            # paragraph indices in tables are appended at the end
+            yield Paragraph(p_el, None), None
+
+
+def sentence_spans(text: str) -> Tuple[List[int], List[str]]:
+    """Split text into sentences once: (cumulative end offsets, stripped sentences)."""
+    ends: List[int] = []
+    sentences: List[str] = []
     cum = 0
-    for s in parts:
-        if cum <= start_index < cum + len(s) + 1:
-            return s.strip()
+    for s in _SENT_SPLIT_RE.split(text):
         cum += len(s) + 1
+        ends.append(cum)
+        sentences.append(s.strip())
+    return ends, sentences
+
+
+def sentence_window(text: str, start_index: int, spans: Tuple[List[int], List[str]] | None = None) -> str:
+    # spans: precomputed sentence_spans(text), reused across highlights of a paragraph
+    ends, sentences = spans if spans is not None else sentence_spans(text)
+    i = bisect_right(ends, start_index)
+    if i < len(sentences):
+        return sentences[i]
     return text.strip()
 
 
-def extract_highlights_with_offsets(doc: Document, filename: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+def iter_paragraph_runs(p_el):
+    """Yield the <w:r> elements whose text makes up Paragraph.text, hyperlink runs included."""
+    for child in p_el.iterchildren(_W_R, _W_HYPERLINK):
+        if child.tag == _W_R:
+            yield child
+        else:
+            yield from child.iterchildren(_W_R)
+
+
+def extract_highlights_with_offsets(
+    body, filename: str, include_paragraphs: bool = True
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     rows: List[Dict[str, Any]] = []
     paragraphs: List[Dict[str, Any]] = []
-    for p, para_index in iter_paragraphs_with_index(doc):
+    for p, para_index in iter_paragraphs_with_index(body):
         para_text = p.text or ""
-        paragraphs.append(
-            {
-                "filename": filename,
-                "para_index": para_index,
-                "text": para_text,
-            }
-        )
+        if include_paragraphs:
+            paragraphs.append(
+                {
+                    "filename": filename,
+                    "para_index": para_index,
+                    "text": para_text,
+                }
+            )
         if not para_text.strip():
             continue
+        # most paragraphs carry no highlight/shading at all: skip the run loop
+        if not _XP_HAS_RUN_COLOR(p._element):
+            continue
+        para_sentences = sentence_spans(para_text)
         idx = 0
-        buf: List[str] = []
         cur_color: Any = None
         seg_start: Any = None
+        seg_end = 0
 
         def do_flush():
-            if cur_color is None or not buf:
+            if cur_color is None or seg_start is None:
                 return
-            text_joined = "".join(buf)
+            # run offsets line up with para_text, so the segment is a plain slice
+            text_joined = para_text[seg_start:seg_end]
             if text_joined.strip():
-                start = seg_start or 0
-                end = start + len(text_joined)
                 rows.append(
                     {
                         "filename": filename,
                         "type": "highlight",
                         "highlight_color": cur_color,
                         "text": text_joined,
-                        "context": sentence_window(para_text, start),
+                        "context": sentence_window(para_text, seg_start, para_sentences),
                         "paragraph": para_text,
-                        "offset_start": start,
-                        "offset_end": end,
+                        "offset_start": seg_start,
+                        "offset_end": seg_end,
                         "para_index": para_index,
                     }
                 )
 
-        for r in p.runs:
-            text = r.text or ""
-            rlen = len(text)
-            color = run_highlight_or_shading(r)
-            if rlen:
-                if color is not None:
-                    if cur_color is None:
-                        cur_color = color
-                        seg_start = idx
-                        buf = [text]
-                    elif color == cur_color:
-                        buf.append(text)
-                    else:
-                        do_flush()
-                        cur_color = color
-                        seg_start = idx
-                        buf = [text]
-                else:
-                    # end of a highlighted segment
+        for r_el in iter_paragraph_runs(p._element):
+            rlen = len(run_element_text(r_el))
+            if not rlen:
+                continue
+            color = run_element_highlight_or_shading(r_el)
+            if color is not None:
+                if color != cur_color:
                     do_flush()
-                    buf = []
-                    cur_color = None
-                    seg_start = None
-                idx += rlen
-        # flush any remaining buffered segment
+                    cur_color = color
+                    seg_start = idx
+                seg_end = idx + rlen
+            else:
+                # end of a highlighted segment
+                do_flush()
+                cur_color = None
+                seg_start = None
+            idx += rlen
+        # flush any remaining segment
         do_flush()
-        buf = []
-        cur_color = None
-        seg_start = None
     return rows, paragraphs
 
 
-def get_comments_map(doc: Document):
+def get_comments_map(comments_xml: bytes | None):
+    """Map comment id -> author/date/text, streaming the comments part XML (None if absent)."""
     comments = {}
-    part = None
-    for rel in doc.part.rels.values():
-        if rel.reltype == RT.COMMENTS:
-            part = rel.target_part
-            break
-    if part is None:
+    if comments_xml is None:
         return comments
-    root = etree.fromstring(part.blob)
-    for c in root.xpath(".//w:comment", namespaces={"w": NS["w"]}):
-        cid = int(c.get("{%s}id" % NS["w"]))
-        author = c.get("{%s}author" % NS["w"]) or ""
-        date = c.get("{%s}date" % NS["w"]) or ""
-        text_runs = c.xpath(".//w:t", namespaces={"w": NS["w"]})
-        ctext = "".join([t.text or "" for t in text_runs]).strip()
+    for _, c in etree.iterparse(io.BytesIO(comments_xml), events=("end",), tag=_W_COMMENT):
+        cid = int(c.get(_W_ID))
+        author = c.get(_W_AUTHOR) or ""
+        date = c.get(_W_DATE) or ""
+        ctext = "".join([t.text or "" for t in c.iter(_W_T)]).strip()
         comments[cid] = {"author": author, "date": date, "comment": ctext}
+        # drop the processed comment (and earlier siblings) so memory stays bounded
+        c.clear()
+        while c.getprevious() is not None:
+            del c.getparent()[0]
     return comments
 
 
-def get_commented_spans(doc: Document):
-    body = doc.element.body
-    open_ids = []
-    spans = {}
-
-    def walk(el):
-        nonlocal open_ids
-        if el.tag == "{%s}commentRangeStart" % NS["w"]:
-            cid = int(el.get("{%s}id" % NS["w"]))
+def get_commented_spans(body):
+    open_ids: List[int] = []
+    spans: Dict[int, List[str]] = {}
+    # Single C-level pass over the tags of interest, in document order
+    for el in body.iter(_W_COMMENT_RANGE_START, _W_COMMENT_RANGE_END, _W_T):
+        tag = el.tag
+        if tag == _W_T:
+            if open_ids and el.text:
+                for cid in open_ids:
+                    spans[cid].append(el.text)
+        elif tag == _W_COMMENT_RANGE_START:
+            cid = int(el.get(_W_ID))
             open_ids.append(cid)
             spans.setdefault(cid, [])
-        elif el.tag == "{%s}commentRangeEnd" % NS["w"]:
-            cid = int(el.get("{%s}id" % NS["w"]))
+        else:
+            cid = int(el.get(_W_ID))
             if cid in open_ids:
                 open_ids.remove(cid)
-        if el.tag == "{%s}t" % NS["w"] and el.text:
-            for cid in open_ids:
-                spans.setdefault(cid, []).append(el.text)
-        for child in el:
-            walk(child)
-
-    walk(body)
     return {cid: "".join(parts).strip() for cid, parts in spans.items() if "".join(parts).strip()}
 
 
-def parse_docx(file_bytes: bytes, filename: str) -> Dict[str, Any]:
-    doc = Document(io.BytesIO(file_bytes))
-    highlights, paragraphs = extract_highlights_with_offsets(doc, filename)
-    comments_map = get_comments_map(doc)
-    quoted_map = get_commented_spans(doc)
+def _part_rels(z: zipfile.ZipFile, partname: str) -> Dict[str, str]:
+    """Map relationship type -> target member name for a package part ("" for the package)."""
+    base = posixpath.dirname(partname)
+    rels_name = posixpath.join(base, "_rels", posixpath.basename(partname) + ".rels")
+    try:
+        root = etree.fromstring(z.read(rels_name))
+    except KeyError:
+        return {}
+    targets: Dict[str, str] = {}
+    for rel in root:
+        if rel.get("TargetMode") == "External":
+            continue
+        target = posixpath.normpath(posixpath.join(base, rel.get("Target", ""))).lstrip("/")
+        targets.setdefault(rel.get("Type"), target)
+    return targets
+
+
+def load_docx_parts(source: bytes | BinaryIO):
+    """Parse the main document part and read the raw comments part XML from a .docx package.
+
+    Opening the zip directly skips python-docx's Document(), which parses every XML part
+    (styles, numbering, headers, ...) although only these two are needed.
+    """
+    # source: the .docx content, or a seekable binary file (read member by member, not loaded whole)
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with zipfile.ZipFile(source) as z:
+        document_name = _part_rels(z, "")[RT.OFFICE_DOCUMENT]
+        document = parse_xml(z.read(document_name))
+        comments_name = _part_rels(z, document_name).get(RT.COMMENTS)
+        comments_xml = z.read(comments_name) if comments_name else None
+    return document, comments_xml
+
+
+def parse_docx(source: bytes | BinaryIO, filename: str, include_paragraphs: bool = True) -> Dict[str, Any]:
+    """Parse a DOCX into highlights, comments and paragraphs.
+
+    include_paragraphs=False leaves the (large) paragraphs list empty.
+    """
+    document, comments_xml = load_docx_parts(source)
+    body = document.body
+    highlights, paragraphs = extract_highlights_with_offsets(body, filename, include_paragraphs)
+    comments_map = get_comments_map(comments_xml)
+    quoted_map = get_commented_spans(body)
 
     comments_list: List[Dict[str, Any]] = []
-    code_re = re.compile(r"\b[A-Z]{1,4}(?:_[A-Z]{1,4})?\b")
     for cid, meta in comments_map.items():
         text = meta.get("comment", "")
-        raw_codes = code_re.findall(text or "") if text else []
-        codes: List[str] = []
-        for token in raw_codes:
-            normalized = (token or "").strip().upper()
-            if not normalized:
-                continue
-            prefix = normalized.split("_")[0]
-            if prefix not in VALID_PREFIXES:
-                continue
-            if normalized in codes:
-                continue
-            codes.append(normalized)
+        raw_codes = _CODE_RE.findall(text or "") if text else []
+        # dict.fromkeys dedupes while keeping first-seen order
+        codes: List[str] = list(dict.fromkeys(raw_codes))
         code = codes[0] if codes else None
         comments_list.append(
             {
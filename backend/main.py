@@ -1,12 +1,82 @@
-from fastapi import FastAPI, UploadFile, File
+import asyncio
+import hashlib
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, UploadFile, File, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Any, Dict, List, Optional
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
 from .extract import parse_docx
-from .state import get_state, set_state, save_docs, list_docs, delete_doc, list_filenames
+from .state import init_db, get_state, set_state, save_docs, list_docs_json, delete_doc, list_filenames
 
-app = FastAPI(title="DOCX Parser API")
+# parse_docx is CPU-bound Python: run it in worker processes so multi-file uploads
+# use all cores. Created for the app's lifetime; without it (e.g. no lifespan),
+# run_in_executor falls back to the default thread pool.
+_parse_executor: Optional[ProcessPoolExecutor] = None
+
+
+# Re-uploading the same corpus is common: remember recent parse results, keyed by
+# content hash + filename (the filename is embedded in every row) + include_paragraphs. Only touched
+# from the event loop, so no lock is needed.
+_PARSE_CACHE: "OrderedDict[Tuple[bytes, str, bool], Dict[str, Any]]" = OrderedDict()
+_PARSE_CACHE_SIZE = 64
+
+
+def _cache_get(key: Tuple[bytes, str, bool]) -> Optional[Dict[str, Any]]:
+    hit = _PARSE_CACHE.get(key)
+    if hit is not None:
+        _PARSE_CACHE.move_to_end(key)
+    return hit
+
+
+def _cache_put(key: Tuple[bytes, str, bool], parsed: Dict[str, Any]) -> None:
+    _PARSE_CACHE[key] = parsed
+    if len(_PARSE_CACHE) > _PARSE_CACHE_SIZE:
+        _PARSE_CACHE.popitem(last=False)
+
+
+def _file_digest(fp: BinaryIO) -> bytes:
+    """blake2b of a file object read in blocks, rewound afterwards (hashlib.file_digest is 3.11+)."""
+    h = hashlib.blake2b()
+    for block in iter(lambda: fp.read(1 << 16), b""):
+        h.update(block)
+    fp.seek(0)
+    return h.digest()
+
+
+def _new_parse_executor() -> ProcessPoolExecutor:
+    # spawn, not the Linux default fork: workers start on demand during requests, while
+    # threads may be inside lxml/libxml2, and forking then can deadlock the child
+    return ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+
+
+def _replace_broken_executor(broken: ProcessPoolExecutor) -> None:
+    """Swap in a fresh pool after a worker died (a broken pool rejects every later submit)."""
+    global _parse_executor
+    # concurrent uploads can all see the same broken pool: only the first one replaces it
+    if _parse_executor is broken:
+        broken.shutdown(wait=False, cancel_futures=True)
+        _parse_executor = _new_parse_executor()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _parse_executor
+    init_db()
+    _parse_executor = _new_parse_executor()
+    try:
+        yield
+    finally:
+        _parse_executor.shutdown()
+        _parse_executor = None
+
+
+app = FastAPI(title="DOCX Parser API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,21 +93,55 @@ class ParseResponse(BaseModel):
     paragraphs: Any
 
 
+async def _parse_uploads(files: List[UploadFile], include_paragraphs: bool = True) -> List[Dict[str, Any]]:
+    """Parse uploaded files concurrently in worker processes, keeping the event loop free.
+
+    Workers need picklable input, so each upload is read into bytes once here.
+    Files already parsed recently (same content and name) come from the cache.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def parse_one(f: UploadFile) -> Dict[str, Any]:
+        content = await f.read()
+        key = (hashlib.blake2b(content).digest(), f.filename, include_paragraphs)
+        parsed = _cache_get(key)
+        if parsed is None:
+            executor = _parse_executor
+            try:
+                parsed = await loop.run_in_executor(executor, parse_docx, content, f.filename, include_paragraphs)
+            except BrokenProcessPool:
+                # e.g. a worker killed by OOM on a huge file: don't leave uploads broken until restart
+                if executor is not None:
+                    _replace_broken_executor(executor)
+                raise HTTPException(status_code=500, detail=f"Parser process died while parsing {f.filename}")
+            _cache_put(key, parsed)
+        return parsed
+
+    return await asyncio.gather(*(parse_one(f) for f in files))
+
+
 @app.post("/api/parse", response_model=ParseResponse)
-async def parse(file: UploadFile = File(...)) -> Dict[str, Any]:
-    data = await file.read()
-    parsed = parse_docx(data, file.filename)
+async def parse(file: UploadFile = File(...), include_paragraphs: bool = True) -> Dict[str, Any]:
+    # A single file gains nothing from the process pool: parse the spooled upload in place
+    # in a thread, without reading it into memory or pickling it to a worker
+    loop = asyncio.get_running_loop()
+    digest = await loop.run_in_executor(None, _file_digest, file.file)
+    key = (digest, file.filename, include_paragraphs)
+    parsed = _cache_get(key)
+    if parsed is None:
+        # zipfile needs file.seekable, which SpooledTemporaryFile only has from Python 3.11
+        source = file.file if hasattr(file.file, "seekable") else await file.read()
+        parsed = await loop.run_in_executor(None, parse_docx, source, file.filename, include_paragraphs)
+        _cache_put(key, parsed)
     return parsed
 
 
 @app.post("/api/parse-multi", response_model=ParseResponse)
-async def parse_multi(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
+async def parse_multi(files: List[UploadFile] = File(...), include_paragraphs: bool = True) -> Dict[str, Any]:
     all_highlights: List[Dict[str, Any]] = []
     all_comments: List[Dict[str, Any]] = []
     all_paragraphs: List[Dict[str, Any]] = []
-    for f in files:
-        content = await f.read()
-        parsed = parse_docx(content, f.filename)
+    for parsed in await _parse_uploads(files, include_paragraphs):
         all_highlights.extend(parsed.get("highlights", []))
         all_comments.extend(parsed.get("comments", []))
         all_paragraphs.extend(parsed.get("paragraphs", []))
@@ -45,24 +149,29 @@ async def parse_multi(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
 
 
 @app.post("/api/upload-multi", response_model=ParseResponse)
-async def upload_multi(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
+async def upload_multi(files: List[UploadFile] = File(...), include_paragraphs: bool = True) -> Response:
     """Parse and persist multiple files, returning the aggregated dataset including previous docs."""
-    for f in files:
-        content = await f.read()
-        parsed = parse_docx(content, f.filename)
-        save_docs({f.filename: parsed})
-    return list_docs()
+    # Stored docs always keep their paragraphs; the flag only trims the response
+    results = await _parse_uploads(files)
+    # SQLite calls block: keep them off the event loop, like the sync endpoints
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, save_docs, {f.filename: parsed for f, parsed in zip(files, results)})
+    body = await loop.run_in_executor(None, lambda: list_docs_json(include_paragraphs=include_paragraphs))
+    return Response(body, media_type="application/json")
 
 
+# The stored docs are already JSON: these endpoints return the spliced body as-is.
+# include_paragraphs=false skips the paragraphs column for clients that don't need it.
 @app.get("/api/docs", response_model=ParseResponse)
-def get_docs() -> Dict[str, Any]:
-    return list_docs()
+def get_docs(include_paragraphs: bool = True) -> Response:
+    return Response(list_docs_json(include_paragraphs=include_paragraphs), media_type="application/json")
 
 
 @app.delete("/api/docs/{filename}")
-def remove_doc(filename: str) -> Dict[str, Any]:
+def remove_doc(filename: str, include_paragraphs: bool = True) -> Response:
     delete_doc(filename)
-    return {"filenames": list_filenames(), **list_docs()}
+    body = list_docs_json({"filenames": list_filenames()}, include_paragraphs=include_paragraphs)
+    return Response(body, media_type="application/json")
 
 
 @app.get("/api/state")
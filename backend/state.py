@@ -1,33 +1,124 @@
-import json
 import os
 import sqlite3
-from typing import Any, Dict
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
 
 # Allow overriding DB path via env for Docker volume persistence
 DB_PATH = os.getenv('BACKEND_DB_PATH', os.path.join(os.path.dirname(__file__), 'state.db'))
 
+# Writes go through one connection shared by the whole process, serialized with _LOCK
+# (sync endpoints run in a thread pool). Reads use one connection per thread and take
+# no lock: with WAL they run concurrently with each other and with the writer.
+_CONN: Optional[sqlite3.Connection] = None
+_LOCK = threading.Lock()
+_READERS = threading.local()
+
+
+def _open() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    # WAL: readers are not blocked by a writer; NORMAL sync is safe with WAL
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """Yield the shared connection; commits on success, rolls back on error."""
+    global _CONN
+    with _LOCK:
+        if _CONN is None:
+            _CONN = _open()
+        with _CONN:
+            yield _CONN
+
 
-def _connect():
-    return sqlite3.connect(DB_PATH)
+def _read() -> sqlite3.Connection:
+    """Return this thread's read-only connection, opening it on first use."""
+    conn = getattr(_READERS, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("PRAGMA query_only=ON")
+        _READERS.conn = conn
+    return conn
 
 
 def init_db() -> None:
+    """Create the tables if missing. Called once at app startup (see backend.main lifespan)."""
     with _connect() as conn:
         conn.execute(
             "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
         )
-        # Persist parsed documents (one row per filename)
+        # Persist parsed documents (one row per filename), one zlib-compressed JSON array per field
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS docs (
                 filename TEXT PRIMARY KEY,
-                data TEXT NOT NULL
+                highlights BLOB NOT NULL,
+                comments BLOB NOT NULL,
+                paragraphs BLOB NOT NULL
             )
             """
         )
+        cols = [row[1] for row in conn.execute("PRAGMA table_info(docs)")]
+        if "data" in cols:
+            _migrate_docs_split(conn)
+        _migrate_docs_compress(conn)
         conn.commit()
 
 
+def _migrate_docs_split(conn: sqlite3.Connection) -> None:
+    """Convert the old docs(filename, data) layout, one JSON object per doc, to per-field columns.
+
+    Rows whose data can't be decoded are moved to docs_legacy, not dropped.
+    """
+    # sqlite3 doesn't open a transaction for DDL on its own: make the whole swap atomic,
+    # committed by init_db, so a crash midway leaves the old table untouched
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    rows = []
+    undecodable = []
+    for fn, data_str in conn.execute("SELECT filename, data FROM docs").fetchall():
+        try:
+            rows.append((fn, *_dump_fields(orjson.loads(data_str))))
+        except Exception:
+            undecodable.append((fn, data_str))
+    if undecodable:
+        conn.execute("CREATE TABLE IF NOT EXISTS docs_legacy (filename TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        conn.executemany("REPLACE INTO docs_legacy(filename, data) VALUES (?, ?)", undecodable)
+    conn.execute("DROP TABLE IF EXISTS docs_new")
+    conn.execute(
+        """
+        CREATE TABLE docs_new (
+            filename TEXT PRIMARY KEY,
+            highlights BLOB NOT NULL,
+            comments BLOB NOT NULL,
+            paragraphs BLOB NOT NULL
+        )
+        """
+    )
+    conn.executemany(
+        "INSERT INTO docs_new(filename, highlights, comments, paragraphs) VALUES (?, ?, ?, ?)", rows
+    )
+    conn.execute("DROP TABLE docs")
+    conn.execute("ALTER TABLE docs_new RENAME TO docs")
+
+
+def _migrate_docs_compress(conn: sqlite3.Connection) -> None:
+    """Compress rows still stored as plain JSON text (written before compression was added)."""
+    rows = conn.execute(
+        "SELECT filename, highlights, comments, paragraphs FROM docs WHERE typeof(highlights) = 'text'"
+    ).fetchall()
+    conn.executemany(
+        "UPDATE docs SET highlights = ?, comments = ?, paragraphs = ? WHERE filename = ?",
+        [(*(zlib.compress(v.encode(), _ZLIB_LEVEL) for v in values), fn) for fn, *values in rows],
+    )
+
+
 DEFAULT_STATE: Dict[str, Any] = {
     "colorMap": {},
     "codeMap": {},
@@ -39,15 +130,12 @@ DEFAULT_STATE: Dict[str, Any] = {
 
 
 def get_state() -> Dict[str, Any]:
-    init_db()
     data: Dict[str, Any] = {}
-    with _connect() as conn:
-        cur = conn.execute("SELECT key, value FROM kv")
-        for k, v in cur.fetchall():
-            try:
-                data[k] = json.loads(v)
-            except Exception:
-                data[k] = v
+    for k, v in _read().execute("SELECT key, value FROM kv").fetchall():
+        try:
+            data[k] = orjson.loads(v)
+        except Exception:
+            data[k] = v
     # merge with defaults
     out = DEFAULT_STATE.copy()
     out.update({k: v for k, v in data.items() if k in DEFAULT_STATE})
@@ -55,61 +143,66 @@ def get_state() -> Dict[str, Any]:
 
 
 def set_state(partial: Dict[str, Any]) -> Dict[str, Any]:
-    init_db()
     # Only allow known keys
     allowed = set(DEFAULT_STATE.keys())
     with _connect() as conn:
         for k, v in partial.items():
             if k in allowed:
                 conn.execute(
-                    "REPLACE INTO kv(key, value) VALUES (?, ?)", (k, json.dumps(v))
+                    "REPLACE INTO kv(key, value) VALUES (?, ?)", (k, orjson.dumps(v).decode())
                 )
         conn.commit()
     return get_state()
 
 
 # ------------------- Docs persistence -------------------
+_DOC_FIELDS = ("highlights", "comments", "paragraphs")
+# Parsed JSON is very repetitive (keys, filenames, paragraph texts): a fast level shrinks it several times
+_ZLIB_LEVEL = 3
+
+
+def _dump_fields(parsed: Dict[str, Any]) -> Tuple[bytes, ...]:
+    """Serialize and compress each of a parsed doc's arrays on its own, in _DOC_FIELDS order."""
+    return tuple(zlib.compress(orjson.dumps(parsed.get(f, [])), _ZLIB_LEVEL) for f in _DOC_FIELDS)
+
+
 def save_docs(items: Dict[str, Dict[str, Any]]) -> None:
     """Save multiple parsed documents. items: {filename: parsed_dict}.
     parsed_dict should have highlights, comments, paragraphs arrays.
     """
-    init_db()
+    rows = [(fn, *_dump_fields(parsed)) for fn, parsed in items.items()]
     with _connect() as conn:
-        for fn, parsed in items.items():
-            conn.execute(
-                "REPLACE INTO docs(filename, data) VALUES (?, ?)", (fn, json.dumps(parsed))
-            )
+        conn.executemany(
+            "REPLACE INTO docs(filename, highlights, comments, paragraphs) VALUES (?, ?, ?, ?)", rows
+        )
         conn.commit()
 
 
 def delete_doc(filename: str) -> None:
-    init_db()
     with _connect() as conn:
         conn.execute("DELETE FROM docs WHERE filename = ?", (filename,))
         conn.commit()
 
 
-def list_docs() -> Dict[str, Any]:
-    """Return aggregated data across all stored docs."""
-    init_db()
-    highlights: list[Dict[str, Any]] = []
-    comments: list[Dict[str, Any]] = []
-    paragraphs: list[Dict[str, Any]] = []
-    with _connect() as conn:
-        cur = conn.execute("SELECT data FROM docs")
-        for (data_str,) in cur.fetchall():
-            try:
-                d = json.loads(data_str)
-                highlights.extend(d.get("highlights", []))
-                comments.extend(d.get("comments", []))
-                paragraphs.extend(d.get("paragraphs", []))
-            except Exception:
-                continue
-    return {"highlights": highlights, "comments": comments, "paragraphs": paragraphs}
+def list_docs_json(extra: Optional[Dict[str, Any]] = None, include_paragraphs: bool = True) -> bytes:
+    """Return aggregated data across all stored docs as a JSON document (bytes).
+
+    Stored arrays are decompressed and spliced together as text, never decoded and re-encoded.
+    extra: additional top-level keys to include before the doc arrays.
+    include_paragraphs: when False the paragraphs column is not read and comes back empty.
+    """
+    fields = _DOC_FIELDS if include_paragraphs else tuple(f for f in _DOC_FIELDS if f != "paragraphs")
+    chunks: Dict[str, List[bytes]] = {f: [] for f in _DOC_FIELDS}
+    for row in _read().execute(f"SELECT {', '.join(fields)} FROM docs").fetchall():
+        for field, blob in zip(fields, row):
+            inner = zlib.decompress(blob)[1:-1]  # strip the surrounding [ ]
+            if inner:
+                chunks[field].append(inner)
+    members = [orjson.dumps(k) + b":" + orjson.dumps(v) for k, v in (extra or {}).items()]
+    members += [b'"%s":[%s]' % (f.encode(), b",".join(chunks[f])) for f in _DOC_FIELDS]
+    return b"{" + b",".join(members) + b"}"
 
 
 def list_filenames() -> list[str]:
-    init_db()
-    with _connect() as conn:
-        cur = conn.execute("SELECT filename FROM docs ORDER BY filename")
-        return [r[0] for r in cur.fetchall()]
+    cur = _read().execute("SELECT filename FROM docs ORDER BY filename")
+    return [r[0] for r in cur.fetchall()]
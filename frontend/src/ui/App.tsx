@@ -587,6 +587,21 @@ function App() {
   }, [jumpSeq, tab, viewerDoc, data])
   // (Removed stray closing brace that caused build error)
 
+  // Whitespace/case-normalized text, memoized per dataset: linking compares each comment
+  // against every highlight and paragraph of its file, so normalize each string only once
+  const normText = useMemo(() => {
+    const cache = new Map<string, string>()
+    return (s: string) => {
+      const key = s || ''
+      let v = cache.get(key)
+      if (v === undefined) {
+        v = key.replace(/\s+/g, ' ').trim().toLowerCase()
+        cache.set(key, v)
+      }
+      return v
+    }
+  }, [data])
+
   // Enrich comments by linking to a matching highlight (via quoted text)
   const commentsEnriched = useMemo(() => {
     if (!data) return [] as (CommentItem & {
@@ -597,8 +612,9 @@ function App() {
       macro?: MacroKey | null
       macroLabel?: string | null
       codeTokens: string[]
+      searchText: string
     })[]
-    const norm = (s: string) => (s || '').replace(/\s+/g, ' ').trim().toLowerCase()
+    const norm = normText
     const highsAll = data.highlights
     return data.comments.map(c => {
       const qNorm = norm(c.quoted || '')
@@ -668,6 +684,9 @@ function App() {
       const macroKey = macroFromLabel(effectiveCat) || primaryResolved?.macro || null
       const color = getCategoryColor(effectiveCat, macroKey)
       const macroLabel = macroKey ? MACRO_INFO[macroKey].label : null
+      // Lowercased fields searched by the comment/kanban query boxes, joined once here
+      // instead of lowercasing four fields per comment on every keystroke
+      const searchText = [c.text, c.quoted, c.author, linked?.text].map(v => (v || '').toLowerCase()).join('\u0001')
       return {
         ...c,
         highlight: linked,
@@ -677,9 +696,10 @@ function App() {
         macro: macroKey,
         macroLabel,
         codeTokens,
+        searchText,
       }
     })
-  }, [data, catOverride, collectCodes, codeMap, getCategoryColor, highlightsByFile, paragraphsByFile])
+  }, [data, catOverride, collectCodes, codeMap, getCategoryColor, highlightsByFile, paragraphsByFile, normText])
 
   const commentDocs = useMemo(() => {
     const set = new Set<string>()
@@ -993,58 +1013,37 @@ function App() {
   const compareSliceB = useMemo(() => compareSlices.find(s => s.key === compareSelectionB), [compareSlices, compareSelectionB])
 
   const filteredComments = useMemo(() => {
-    let arr = commentsEnriched
-    if (fDoc.length) arr = arr.filter(c => fDoc.includes((c.filename || '')))
-    if (fCode.length) {
-      arr = arr.filter(c => {
-        const tokensUpper = (c.codeTokens || []).map(t => t.toUpperCase())
-        if (!tokensUpper.length) return false
-        return fCode.some(code => tokensUpper.includes(code.toUpperCase()))
-      })
-    }
-    if (fColor.length) {
-      arr = arr.filter(c => {
-        if (!c.macro) return false
-        return fColor.includes(c.macro)
-      })
-    }
-    if (fCategory.length) {
-      arr = arr.filter(c => {
-        const label = (c.category || 'non-categorizzato').trim() || 'non-categorizzato'
-        return fCategory.includes(label)
-      })
-    }
+    // Build the lookup sets once, then test every active filter in a single pass
+    const lowerSet = (values: string[]) => values.length ? new Set(values.map(s => s.toLowerCase())) : null
+    const docs = fDoc.length ? new Set(fDoc) : null
+    const codes = fCode.length ? new Set(fCode.map(code => code.toUpperCase())) : null
+    const colors = fColor.length ? new Set(fColor) : null
+    const cats = fCategory.length ? new Set(fCategory) : null
     // metadata-based filters by filename
-    if (fIntervistatore.length) arr = arr.filter(c => {
-      const fm = c.filename ? meta[c.filename] : undefined
-      return fm ? fIntervistatore.map(s=>s.toLowerCase()).includes((fm.intervistatore||'').toLowerCase()) : false
-    })
-    if (fIntervistato.length) arr = arr.filter(c => {
-      const fm = c.filename ? meta[c.filename] : undefined
-      return fm ? fIntervistato.map(s=>s.toLowerCase()).includes((fm.intervistato||'').toLowerCase()) : false
-    })
-    if (fRuolo.length) arr = arr.filter(c => {
-      const fm = c.filename ? meta[c.filename] : undefined
-      return fm ? fRuolo.map(s=>s.toLowerCase()).includes((fm.ruolo||'').toLowerCase()) : false
-    })
-    if (fScuola.length) arr = arr.filter(c => {
-      const fm = c.filename ? meta[c.filename] : undefined
-      return fm ? fScuola.map(s=>s.toLowerCase()).includes((fm.scuola||'').toLowerCase()) : false
-    })
-    if (fGruppo.length) arr = arr.filter(c => {
-      const fm = c.filename ? meta[c.filename] : undefined
-      return fm ? fGruppo.map(s=>s.toLowerCase()).includes((fm.gruppo||'').toLowerCase()) : false
+    const metaFilters = ([
+      ['intervistatore', lowerSet(fIntervistatore)],
+      ['intervistato', lowerSet(fIntervistato)],
+      ['ruolo', lowerSet(fRuolo)],
+      ['scuola', lowerSet(fScuola)],
+      ['gruppo', lowerSet(fGruppo)],
+    ] as [keyof FileMeta, Set<string> | null][]).filter((f): f is [keyof FileMeta, Set<string>] => f[1] !== null)
+    const q = fQuery.trim().toLowerCase()
+    if (!docs && !codes && !colors && !cats && !metaFilters.length && !q) return commentsEnriched
+    return commentsEnriched.filter(c => {
+      if (docs && !docs.has(c.filename || '')) return false
+      if (codes && !(c.codeTokens || []).some(t => codes.has(t.toUpperCase()))) return false
+      if (colors && !(c.macro && colors.has(c.macro))) return false
+      if (cats && !cats.has((c.category || 'non-categorizzato').trim() || 'non-categorizzato')) return false
+      if (metaFilters.length) {
+        const fm = c.filename ? meta[c.filename] : undefined
+        if (!fm) return false
+        for (const [field, targets] of metaFilters) {
+          if (!targets.has((fm[field] || '').toLowerCase())) return false
+        }
+      }
+      if (q && !c.searchText.includes(q)) return false
+      return true
     })
-    if (fQuery.trim()) {
-      const q = fQuery.trim().toLowerCase()
-      arr = arr.filter(c =>
-        (c.text || '').toLowerCase().includes(q) ||
-        (c.quoted || '').toLowerCase().includes(q) ||
-        (c.author || '').toLowerCase().includes(q) ||
-        ((c.highlightText || c.highlight?.text || '').toLowerCase().includes(q))
-      )
-    }
-    return arr
   }, [commentsEnriched, fDoc, fCode, fColor, fCategory, fQuery, fIntervistatore, fIntervistato, fRuolo, fScuola, fGruppo, meta])
 
   // Helper to read multiple selected options
@@ -1827,12 +1826,7 @@ function App() {
                   })
                   if (kQuery.trim()) {
                     const q = kQuery.trim().toLowerCase()
-                    items = items.filter(c =>
-                      (c.text || '').toLowerCase().includes(q) ||
-                      (c.quoted || '').toLowerCase().includes(q) ||
-                      (c.author || '').toLowerCase().includes(q) ||
-                      ((c.highlightText || c.highlight?.text || '').toLowerCase().includes(q))
-                    )
+                    items = items.filter(c => c.searchText.includes(q))
                   }
 
                   // Build columns based on view